@@ -1,10 +1,12 @@
 from flask import Flask, render_template, jsonify, send_file, request, Response
 import pandas as pd
+import numpy as np
 import folium
 from folium import plugins
 import json
 from datetime import datetime
 import io
+import html
 import locale
 
 # Set locale for Spanish date parsing
@@ -29,9 +31,17 @@ latam_countries = [
     'Paraguay', 'Perú', 'Panamá', 'Uruguay', 'Venezuela', 'REP DOM'
 ]
 
+# Sorted date index and dense value matrix used by the movers ranking
+dates_index = None
+values_matrix = None
+matrix_countries = []
+data_version = 0
+movers_cache = {}
+MOVERS_CACHE_SIZE = 512
+
 def load_data():
     """Load and process the EMBI CSV data"""
-    global df, dates_list
+    global df, dates_list, dates_index, values_matrix, matrix_countries, data_version
     
     try:
         # Try different encodings
@@ -95,6 +105,18 @@ def load_data():
             if country in df.columns:
                 df[country] = pd.to_numeric(df[country].astype(str).str.replace(',', '.'), errors='coerce')
         
+        # Build the sorted date index and value matrix (rows: dates, cols: countries).
+        # Duplicated dates keep their first row after sorting, matching the
+        # row.iloc[0] lookups used by the map and download endpoints.
+        unique_df = df.drop_duplicates(subset='Fecha', keep='first')
+        matrix_countries = [c for c in latam_countries if c in df.columns]
+        dates_index = unique_df['Fecha'].to_numpy(dtype='datetime64[D]')
+        values_matrix = unique_df[matrix_countries].to_numpy(dtype=float)
+        
+        # Invalidate cached movers rankings from any previous load
+        data_version += 1
+        movers_cache.clear()
+        
         print(f"Data loaded successfully: {len(df)} rows, {len(dates_list)} dates")
         return True
     except Exception as e:
@@ -156,8 +178,135 @@ def get_color_for_value_simple(value, q33, q67):
     else:
         return '#e74c3c'  # Red
 
-def create_map_for_date(date_str):
-    """Create a Folium map for a specific date using GeoJson choropleth"""
+def get_color_for_change(value):
+    """Return color based on the direction of a spread change"""
+    if pd.isna(value):
+        return '#cccccc'  # Gray for missing data
+    elif value <= -0.005:
+        return '#2ecc71'  # Green: spread tightened
+    elif value < 0.005:
+        return '#f39c12'  # Yellow/Orange: unchanged
+    else:
+        return '#e74c3c'  # Red: spread widened
+
+def resolve_date_position(date_str, clamp=False):
+    """Return the index row of the last trading day on or before date_str.
+
+    Dates before the first trading day raise ValueError, or resolve to the
+    first row if clamp is True.
+    """
+    timestamp = pd.Timestamp(date_str)
+    if pd.isna(timestamp):
+        raise ValueError(f'Invalid date: {date_str}')
+    date_obj = np.datetime64(timestamp.date(), 'D')
+    pos = int(np.searchsorted(dates_index, date_obj, side='right')) - 1
+    if pos < 0:
+        if clamp:
+            return 0
+        raise ValueError(f'No data on or before {date_str}')
+    return pos
+
+def position_to_date(pos):
+    """Return the date at an index row as 'YYYY-MM-DD'"""
+    return str(np.datetime_as_string(dates_index[pos], unit='D'))
+
+def parse_positive_int_arg(name, default=None):
+    """Read a positive integer query parameter, raising ValueError if invalid"""
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise ValueError(f"'{name}' must be a positive integer")
+    return value
+
+def resolve_movers_range(from_date=None, to_date=None, days=None):
+    """Resolve the (start, end) index rows for a movers comparison.
+
+    The end defaults to the latest date. The start is either an explicit
+    date or the trading day `days` rows before the end; both are clamped
+    to the first trading day.
+    """
+    if dates_index is None or len(dates_index) == 0:
+        raise ValueError('No data loaded')
+    end_pos = resolve_date_position(to_date) if to_date else len(dates_index) - 1
+    if from_date:
+        start_pos = resolve_date_position(from_date, clamp=True)
+    elif days is not None and days > 0:
+        start_pos = max(end_pos - days, 0)
+    else:
+        raise ValueError("Provide either 'from' or a positive 'days'")
+    if start_pos > end_pos:
+        raise ValueError("'from' must not be after 'to'")
+    return start_pos, end_pos
+
+def compute_changes(start_pos, end_pos):
+    """Return absolute and percentage changes for all countries between two index rows"""
+    start_values = values_matrix[start_pos]
+    end_values = values_matrix[end_pos]
+    abs_change = end_values - start_values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_change = np.where(start_values != 0, abs_change / start_values * 100, np.nan)
+    return abs_change, pct_change
+
+def _top_k(scores, k):
+    """Return the positions of the k largest scores, in descending order"""
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=int)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def compute_movers(start_pos, end_pos, n=5, by='abs'):
+    """Rank the countries whose spread widened or tightened most between two index rows"""
+    key = (data_version, start_pos, end_pos, n, by)
+    cached = movers_cache.get(key)
+    if cached is not None:
+        return cached
+
+    abs_change, pct_change = compute_changes(start_pos, end_pos)
+    metric = pct_change if by == 'pct' else abs_change
+    widened = np.flatnonzero(metric > 0)
+    tightened = np.flatnonzero(metric < 0)
+
+    def to_rows(candidates, scores):
+        rows = []
+        for rank, i in enumerate(candidates[_top_k(scores, n)], start=1):
+            rows.append({
+                'rank': rank,
+                'country': matrix_countries[i],
+                'from_value': float(values_matrix[start_pos, i]),
+                'to_value': float(values_matrix[end_pos, i]),
+                'change': float(abs_change[i]),
+                'pct_change': None if np.isnan(pct_change[i]) else float(pct_change[i])
+            })
+        return rows
+
+    result = {
+        'from': position_to_date(start_pos),
+        'to': position_to_date(end_pos),
+        'by': by,
+        'n': n,
+        'widened': to_rows(widened, metric[widened]),
+        'tightened': to_rows(tightened, -metric[tightened])
+    }
+
+    if len(movers_cache) >= MOVERS_CACHE_SIZE:
+        movers_cache.clear()
+    movers_cache[key] = result
+    return result
+
+def create_map_for_date(date_str, movers_range=None):
+    """Create a Folium map for a specific date using GeoJson choropleth.
+
+    If movers_range (start, end index rows) is given, countries are colored
+    by the spread change between those rows instead of the spread level.
+    """
     try:
         print(f"Creating choropleth map for date: {date_str}")
         
@@ -182,6 +331,13 @@ def create_map_for_date(date_str):
                 if pd.notna(value):
                     data_values.append(value)
         
+        # Movers overlay: replace levels with the change over movers_range
+        compare_date = None
+        if movers_range:
+            compare_date = position_to_date(movers_range[0])
+            abs_change, _ = compute_changes(*movers_range)
+            country_values = dict(zip(matrix_countries, abs_change))
+        
         # Calculate thresholds
         if data_values:
             q33 = pd.Series(data_values).quantile(0.33)
@@ -242,7 +398,10 @@ def create_map_for_date(date_str):
             fill_color = '#f0f0f0' 
             if csv_name and csv_name in country_values:
                 val = country_values[csv_name]
-                fill_color = get_color_for_value_simple(val, q33, q67)
+                if compare_date:
+                    fill_color = get_color_for_change(val)
+                else:
+                    fill_color = get_color_for_value_simple(val, q33, q67)
             
             return {
                 'fillColor': fill_color,
@@ -368,6 +527,7 @@ def create_map_for_date(date_str):
                 val = country_values[country]
                 if pd.notna(val):
                     display_coords = label_positions.get(country, base_coords)
+                    label = f'{val:+.2f}' if compare_date else f'{val:.2f}%'
                     
                     # Draw callout line if position is offset
                     if display_coords != base_coords:
@@ -384,12 +544,26 @@ def create_map_for_date(date_str):
                         icon=folium.DivIcon(
                             icon_size=(150,36),
                             icon_anchor=(75,18),
-                            html=f'<div style="font-size: 10pt; font-weight: bold; color: black; background-color: rgba(255,255,255,0.7); padding: 2px 4px; border-radius: 4px; text-align: center; border: 1px solid #666; width: fit-content; white-space: nowrap; box-shadow: 1px 1px 3px rgba(0,0,0,0.2); pointer-events: none;">{val:.2f}%</div>',
+                            html=f'<div style="font-size: 10pt; font-weight: bold; color: black; background-color: rgba(255,255,255,0.7); padding: 2px 4px; border-radius: 4px; text-align: center; border: 1px solid #666; width: fit-content; white-space: nowrap; box-shadow: 1px 1px 3px rgba(0,0,0,0.2); pointer-events: none;">{label}</div>',
                         )
                     ).add_to(m)
         
         # Add legend
-        legend_html = f'''
+        if compare_date:
+            legend_html = f'''
+        <div style="position: fixed; 
+                    bottom: 50px; right: 50px; width: 220px; height: 160px; 
+                    background-color: white; border:2px solid grey; z-index:9999; 
+                    font-size:14px; padding: 15px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <p style="margin: 0 0 10px 0; font-weight: bold; font-size: 16px;">Variación EMBI (pp)</p>
+            <p style="margin: 5px 0;"><span style="background-color: #2ecc71; padding: 3px 10px; border-radius: 3px; color: white;">■</span> Se comprimió</p>
+            <p style="margin: 5px 0;"><span style="background-color: #f39c12; padding: 3px 10px; border-radius: 3px; color: white;">■</span> Sin cambio</p>
+            <p style="margin: 5px 0;"><span style="background-color: #e74c3c; padding: 3px 10px; border-radius: 3px; color: white;">■</span> Se amplió</p>
+            <p style="margin: 10px 0 0 0; font-size: 11px; color: #666; border-top: 1px solid #eee; padding-top: 8px;">📅 {compare_date} → {date_str}</p>
+        </div>
+        '''
+        else:
+            legend_html = f'''
         <div style="position: fixed; 
                     bottom: 50px; right: 50px; width: 220px; height: 160px; 
                     background-color: white; border:2px solid grey; z-index:9999; 
@@ -425,10 +599,40 @@ def get_dates():
         'count': len(dates_list)
     })
 
+@app.route('/api/movers')
+def get_movers():
+    """Return the countries whose spread widened or tightened most between two dates"""
+    try:
+        n = parse_positive_int_arg('n', 5)
+        by = request.args.get('by', 'abs')
+        if by not in ('abs', 'pct'):
+            return jsonify({'error': "'by' must be 'abs' or 'pct'"}), 400
+        
+        start_pos, end_pos = resolve_movers_range(
+            request.args.get('from'),
+            request.args.get('to'),
+            parse_positive_int_arg('days')
+        )
+        return jsonify(compute_movers(start_pos, end_pos, n, by))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/map/<date>')
 def get_map(date):
-    """Return map HTML for a specific date"""
-    map_html = create_map_for_date(date)
+    """Return map HTML for a specific date, optionally with the movers overlay"""
+    movers_range = None
+    if request.args.get('overlay') == 'movers':
+        try:
+            movers_range = resolve_movers_range(
+                request.args.get('from'),
+                date,
+                parse_positive_int_arg('days')
+            )
+        except ValueError as e:
+            return Response(f"<html><body><h2>{html.escape(str(e))}</h2></body></html>", mimetype='text/html', status=400)
+    map_html = create_map_for_date(date, movers_range=movers_range)
     return Response(map_html, mimetype='text/html')
 
 @app.route('/api/debug/map/<date>')
@@ -106,8 +106,11 @@ async function loadMap(date) {
         }
     }, 10000);
 
-    // Set source
-    const mapUrl = `/api/map/${date}`;
+    // Set source (with movers overlay if a comparison window is selected)
+    const overlayDays = document.getElementById('overlaySelect').value;
+    const mapUrl = overlayDays
+        ? `/api/map/${date}?overlay=movers&days=${overlayDays}`
+        : `/api/map/${date}`;
     console.log("📡 Asignando src al iframe:", mapUrl);
     iframe.src = mapUrl;
 }
@@ -149,6 +152,11 @@ function setupEventListeners() {
     // Download type selector
     document.getElementById('downloadType').addEventListener('change', updateDownloadControls);
 
+    // Map overlay selector
+    document.getElementById('overlaySelect').addEventListener('change', () => {
+        loadMap(dates[currentIndex]);
+    });
+
     // Download button
     document.getElementById('downloadBtn').addEventListener('click', handleDownload);
 
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+def first_row(date):
+    """Row the existing lookups (row.iloc[0]) use for a date"""
+    return app.df[app.df['Fecha'] == pd.to_datetime(date)].iloc[0]
+
+
+def test_top_k_orders_descending():
+    scores = np.array([0.5, 3.0, -1.0, 2.0, 1.0])
+    assert app._top_k(scores, 3).tolist() == [1, 3, 4]
+
+
+def test_top_k_k_at_least_len():
+    scores = np.array([0.5, 3.0, -1.0])
+    assert app._top_k(scores, 3).tolist() == [1, 0, 2]
+    assert app._top_k(scores, 10).tolist() == [1, 0, 2]
+    assert app._top_k(scores, 0).tolist() == []
+    assert app._top_k(np.array([]), 5).tolist() == []
+
+
+def test_date_index_has_no_duplicates():
+    assert len(np.unique(app.dates_index)) == len(app.dates_index)
+
+
+def test_duplicated_date_resolves_to_first_row():
+    duplicated = app.df['Fecha'][app.df['Fecha'].duplicated()]
+    assert not duplicated.empty
+    date = duplicated.iloc[0].strftime('%Y-%m-%d')
+    pos = app.resolve_date_position(date)
+    expected = first_row(date)[app.matrix_countries].to_numpy(dtype=float)
+    np.testing.assert_array_equal(app.values_matrix[pos], expected)
+
+
+def test_non_trading_date_resolves_to_previous_trading_day():
+    trading = pd.DatetimeIndex(app.dates_index)
+    gap = np.flatnonzero(np.diff(trading) > pd.Timedelta(days=1))[0]
+    missing = trading[gap] + pd.Timedelta(days=1)
+    assert app.resolve_date_position(missing.strftime('%Y-%m-%d')) == gap
+
+
+def test_resolve_movers_range():
+    last = len(app.dates_index) - 1
+    assert app.resolve_movers_range(days=5) == (last - 5, last)
+
+    start, end = app.resolve_movers_range('2019-01-02', '2020-01-21')
+    assert app.position_to_date(start) <= '2019-01-02'
+    assert app.position_to_date(end) == '2020-01-21'
+
+    # Both oversized windows and early dates clamp to the first trading day
+    assert app.resolve_movers_range(days=10 ** 6) == (0, last)
+    assert app.resolve_movers_range(from_date='1990-01-01') == (0, last)
+    # Dates outside the nanosecond Timestamp range must not wrap around
+    assert app.resolve_movers_range(from_date='1500-01-01') == (0, last)
+    assert app.resolve_movers_range('2020-01-01', '2300-01-01')[1] == last
+    assert app.resolve_movers_range(to_date='2020-01-21T00:00Z', days=1)[1] == \
+        app.resolve_date_position('2020-01-21')
+
+    with pytest.raises(ValueError):
+        app.resolve_movers_range(to_date='1990-01-01', days=5)
+    with pytest.raises(ValueError):
+        app.resolve_movers_range('2020-01-21', '2019-01-02')
+    with pytest.raises(ValueError):
+        app.resolve_movers_range()
+
+
+@pytest.mark.parametrize('by', ['abs', 'pct'])
+def test_movers_match_pandas_diff(by):
+    start, end = app.resolve_movers_range('2019-01-02', '2020-01-21')
+    result = app.compute_movers(start, end, n=3, by=by)
+
+    before = first_row(result['from'])[app.matrix_countries].astype(float)
+    after = first_row(result['to'])[app.matrix_countries].astype(float)
+    change = after - before
+    if by == 'pct':
+        change = change / before * 100
+    change = change.dropna()
+
+    widened = change[change > 0].sort_values(ascending=False).head(3)
+    tightened = change[change < 0].sort_values().head(3)
+    assert [r['country'] for r in result['widened']] == widened.index.tolist()
+    assert [r['country'] for r in result['tightened']] == tightened.index.tolist()
+
+    for r in result['widened'] + result['tightened']:
+        assert r['from_value'] == before[r['country']]
+        assert r['to_value'] == after[r['country']]
+
+
+def test_cache_cleared_on_reload():
+    app.compute_movers(0, len(app.dates_index) - 1)
+    assert app.movers_cache
+    version = app.data_version
+
+    assert app.load_data()
+    assert not app.movers_cache
+    assert app.data_version == version + 1
+
+
+@pytest.mark.parametrize('query', ['n=abc&days=5', 'n=0&days=5', 'days=abc', 'days=-3'])
+def test_movers_rejects_invalid_ints(query):
+    response = app.app.test_client().get(f'/api/movers?{query}')
+    assert response.status_code == 400
+    assert 'must be a positive integer' in response.json['error']